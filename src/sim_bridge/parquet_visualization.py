@@ -35,17 +35,21 @@ import plotly.express as px
 import plotly.graph_objects as go
 
 import plotly.io as pio
-print(pio.renderers.default)
-pio.renderers.default = "iframe"
+# iframe renderer は display のたびに plotly.js を丸ごと埋め込んだ HTML を
+# 書き出すので使わない; 大きい figure は write_html(include_plotlyjs='cdn')
+# で明示的に保存する（セクション 2 参照）
 print(pio.renderers.default)
 
 # from datetime import datetime, timedelta
 
-pl.Config.set_tbl_rows(-1)
+# set_tbl_rows(-1) はやめる: 全行を文字列整形するので、大きい df を
+# うっかり表示したセルの実行時間と notebook サイズが跳ね上がる。
+# 全件見たいときは該当セルで .head(N) / .to_pandas() を明示する
 # pl.Config.set_tbl_cols(-1)
 
 #3 
 import datetime as dt
+import numpy as np
 import matplotlib.pyplot as plt
 
 #4 
@@ -86,8 +90,11 @@ display(df.head(3).to_pandas())
 # %%
 
 display(df.head(3))
-unique_values = df["vehicle_id"].unique()
-print(unique_values)
+# vehicle_id だけを projection pushdown で読む（他の column chunk はデコードしない）
+unique_values = (
+    pl.scan_parquet(p_tram_vp_04).select(pl.col("vehicle_id").unique()).collect().to_series()
+)
+print(unique_values.head(50), unique_values.len())
 
 
 # %% [markdown]
@@ -97,8 +104,10 @@ print(unique_values)
 p_tram_tu_14 = "~/adaptive-signal-open-data/data/bronze/chitetsu_tram/trip_updates/20251114.parquet"
 df = pl.read_parquet(p_tram_tu_14)
 display(df.head(3))
-unique_values = df["vehicle_id"].unique()
-print(unique_values)
+unique_values = (
+    pl.scan_parquet(p_tram_tu_14).select(pl.col("vehicle_id").unique()).collect().to_series()
+)
+print(unique_values.head(50), unique_values.len())
 
 # %% [markdown] jp-MarkdownHeadingCollapsed=true
 # ## 1.2 multipul files (all days)
@@ -108,7 +117,9 @@ print(unique_values)
 
 # %%
 
-df = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/trip_updates/*.parquet")
+# scan_parquet + collect にして projection/predicate pushdown が効く形にする
+# （row-group statistics による読み飛ばしと並列デコード）
+df = pl.scan_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/trip_updates/*.parquet", parallel="row_groups").collect()
 print(df.shape)
 display(df[110000:110005].to_pandas())
 print(df.schema)
@@ -120,8 +131,8 @@ print(df.schema)
 
 # %%
 
-# df = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/vehicle_positions/*.parquet")
-df = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/trip_updates/*.parquet")
+# df = pl.scan_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/vehicle_positions/*.parquet", parallel="row_groups").collect()
+df = pl.scan_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/trip_updates/*.parquet", parallel="row_groups").collect()
 print(df.shape)
 display(df[110000:110005].to_pandas())
 print(df.schema)
@@ -132,9 +143,7 @@ print(df.schema)
 
 # %%
 
-# df = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/vehicle_positions/*.parquet")
-# df = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/trip_updates/*.parquet")
-df = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_bus/vehicle_positions/*.parquet")
+df = pl.scan_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_bus/vehicle_positions/*.parquet", parallel="row_groups").collect()
 print(df.shape)
 display(df[110000:110005].to_pandas())
 print(df.schema)
@@ -145,10 +154,22 @@ print(df.schema)
 
 # %%
 
-df1 = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/vehicle_positions/*.parquet")
-df2 = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/trip_updates/*.parquet")
-df3 = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_bus/vehicle_positions/*.parquet")
-df4 = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_bus/trip_updates/*.parquet")
+# 4 つの glob は独立した I/O バウンドの読み込みなので thread pool で重ねる
+# （polars は Parquet デコード中 GIL を解放するため wall-clock は
+# sum(file_time) ではなく max(file_time) に近づく）
+from concurrent.futures import ThreadPoolExecutor
+
+_globs = [
+    "~/adaptive-signal-open-data/data/bronze/chitetsu_tram/vehicle_positions/*.parquet",
+    "~/adaptive-signal-open-data/data/bronze/chitetsu_tram/trip_updates/*.parquet",
+    "~/adaptive-signal-open-data/data/bronze/chitetsu_bus/vehicle_positions/*.parquet",
+    "~/adaptive-signal-open-data/data/bronze/chitetsu_bus/trip_updates/*.parquet",
+]
+with ThreadPoolExecutor(max_workers=4) as ex:
+    df1, df2, df3, df4 = ex.map(
+        lambda g: pl.scan_parquet(g, parallel="row_groups").collect(),
+        _globs,
+    )
 
 print(df4.shape)
 display(df4[110000:110005].to_pandas())
@@ -164,10 +185,26 @@ print(df4.schema)
 # %%
 target_dir = Path.home() / "adaptive-signal-open-data" / "data" / "bronze" / "chitetsu_tram" / "combined_tram_vp"
 target_dir.mkdir(parents=True, exist_ok=True)
-# constructs the path object in memory.
-output_path = target_dir / "combined_tram_vp.parquet"
 
-df1.write_parquet(output_path)
+# date_str_jst で Hive パーティション化して書き出す:
+# 単日だけ読むセルは該当パーティションのバイトしか読まなくて済む
+# snapshot_ts でソートしてから書くと row-group の min/max statistics が
+# 引き締まり、時刻レンジ述語での row-group 読み飛ばしが効く
+# 月分の eager フレームを経由せず scan → sink でストリーム書き出し
+(
+    pl.scan_parquet(
+        "~/adaptive-signal-open-data/data/bronze/chitetsu_tram/vehicle_positions/*.parquet",
+        parallel="row_groups",
+    )
+    .sort("snapshot_ts")
+    .sink_parquet(
+        pl.PartitionBy(str(target_dir), key="date_str_jst"),
+        compression="zstd",
+        compression_level=3,
+        row_group_size=512_000,
+        statistics=True,
+    )
+)
 
 display(df1.head(3))
 
@@ -177,10 +214,22 @@ display(df1.head(3))
 # %%
 target_dir = Path.home() / "adaptive-signal-open-data" / "data" / "bronze" / "chitetsu_bus" / "combined_bus_vp"
 target_dir.mkdir(parents=True, exist_ok=True)
-# constructs the path object in memory.
-output_path = target_dir / "combined_bus_vp.parquet"
 
-df3.write_parquet(output_path)
+# tram 側と同様、ソート済み row-group + zstd のストリーム書き出し
+(
+    pl.scan_parquet(
+        "~/adaptive-signal-open-data/data/bronze/chitetsu_bus/vehicle_positions/*.parquet",
+        parallel="row_groups",
+    )
+    .sort("snapshot_ts")
+    .sink_parquet(
+        pl.PartitionBy(str(target_dir), key="date_str_jst"),
+        compression="zstd",
+        compression_level=3,
+        row_group_size=512_000,
+        statistics=True,
+    )
+)
 
 display(df3.head(3))
 display(df3.schema)
@@ -189,7 +238,10 @@ display(df3.schema)
 # # 2. Map visualization (failed)
 
 # %%
-df = pl.read_parquet("~/adaptive-signal-open-data/data/bronze/chitetsu_tram/combined_tram_vp/combined_tram_vp.parquet")
+df = pl.read_parquet(
+    "~/adaptive-signal-open-data/data/bronze/chitetsu_tram/combined_tram_vp/**/*.parquet",
+    hive_partitioning=True,
+)
 
 df_plot = df.with_columns([
     pl.col("lat").alias("latitude"),
@@ -197,21 +249,41 @@ df_plot = df.with_columns([
 ]).drop_nulls(["latitude", "longitude"])
 
 # time-series map animation.
-pdf = df_plot.sort("snapshot_ts").head(1000).to_pandas()
-fig = px.scatter_geo(
-    pdf,
-    lat="latitude", lon="longitude",
-    color="vehicle_id",
-    animation_frame="snapshot_ts",
-    animation_group="vehicle_id",
-    hover_data=["route_id", "speed"],
-    projection="natural earth",
-    title="Vehicles (sample)"
+# px.scatter_geo の SVG アニメーションはフレーム数×点数で破綻するので、
+# polars の partition_by でフレームを前組みし、WebGL の Scattermapbox に
+# numpy 配列で渡す（Python list 経由より大幅に速い）
+sample = df_plot.sort("snapshot_ts").head(1000)
+frames = [
+    go.Frame(
+        data=[go.Scattermapbox(
+            lat=g["latitude"].to_numpy(),
+            lon=g["longitude"].to_numpy(),
+            mode="markers",
+            text=g["vehicle_id"].to_list(),
+        )],
+        name=str(ts[0]),
+    )
+    for ts, g in sample.partition_by("snapshot_ts", as_dict=True, maintain_order=True).items()
+]
+fig = go.Figure(data=frames[0].data if frames else [], frames=frames)
+fig.update_layout(
+    mapbox_style="open-street-map",
+    mapbox_center={"lat": 36.7, "lon": 137.2},
+    mapbox_zoom=10,
+    height=700,
+    title="Vehicles (sample)",
+    uirevision="vehicles",
+    updatemenus=[{
+        "type": "buttons",
+        "buttons": [{"label": "Play", "method": "animate", "args": [None]}],
+    }],
 )
-fig.update_geos(lataxis_range=[36.4, 37.1], lonaxis_range=[136.9, 137.7])
-fig.update_layout(height=700)
 
-fig.show()
+# show() の iframe 書き出しではなく CDN 参照の HTML として保存する:
+# include_plotlyjs='cdn' で ~3MB の plotly.js 同梱を省き、
+# auto_play=False でフレーム実体化を再生ボタン押下まで遅延させる
+fig.write_html("vehicles_animation.html", include_plotlyjs="cdn", auto_play=False)
+print("Saved to vehicles_animation.html")
 # 再生ボタン/スライダーで時間進行確認可能。​
 
 # 軌跡線付き（過去位置保持）
@@ -257,38 +329,48 @@ fig.show()
 
 # %%
 # parquet読み込み → snapshot_ts の型確認・変換・05:30-23:59でフィルタ → 可視化準備
+# scan_parquet で遅延読み込みにし、フィルタを collect 前に積むことで
+# row-group statistics による読み飛ばしとストリーミング実行を効かせる
 
-p = Path.home() / 'adaptive-signal-open-data' / 'data' / 'bronze' / 'chitetsu_tram' / 'combined_tram_vp' / 'combined_tram_vp.parquet'
-df = pl.read_parquet(str(p))
-print('total rows:', df.height)
-print('snapshot_ts schema:', df.schema.get('snapshot_ts'))
+p = Path.home() / 'adaptive-signal-open-data' / 'data' / 'bronze' / 'chitetsu_tram' / 'combined_tram_vp'
 
-# 場合分けで安全に Datetime に変換: まず速い str.strptime を試し、ダメなら pandas.to_datetime を使う
-t = df.schema.get('snapshot_ts')
-if t != pl.Datetime:
-    try:
-        df = df.with_columns(pl.col('snapshot_ts').str.strptime(pl.Datetime, strict=False).alias('snapshot_ts'))
-        print('parsed snapshot_ts with pl.str.strptime')
-    except Exception as e:
-        print('str.strptime failed, falling back to pandas parser:', e)
-        df = df.with_columns(pl.col('snapshot_ts').apply(lambda x: pd.to_datetime(x, errors='coerce'), return_dtype=pl.Datetime).alias('snapshot_ts'))
-        print('parsed snapshot_ts with pandas.to_datetime via apply')
+# 解析済み Datetime + フィルタ済みフレームの IPC キャッシュ
+# （source の mtime で鍵付け; warm run は mmap 読みで再パースなし）
+cache_p = p / '_service_hours_cache.arrow'
+src_mtime = max((f.stat().st_mtime for f in p.glob('**/*.parquet')), default=0.0)
+
+if cache_p.exists() and cache_p.stat().st_mtime >= src_mtime:
+    df_filtered = pl.read_ipc(str(cache_p), memory_map=True)
+    print('loaded filtered frame from IPC cache:', df_filtered.height, 'rows')
 else:
-    print('snapshot_ts already Datetime')
-
-# parsing に失敗した行を削除しておく
-n_before = df.height
-df = df.filter(pl.col('snapshot_ts').is_not_null())
-n_after = df.height
-print(f'rows after dropping unparsable snapshot_ts: {n_after} (removed {n_before-n_after})')
-
-# 時刻フィルタ（各日の 05:30〜23:59）
-hour = pl.col('snapshot_ts').dt.hour()
-minute = pl.col('snapshot_ts').dt.minute()
-start_cond = (hour > 5) | ((hour == 5) & (minute >= 30))
-end_cond = (hour <= 23)
-df_filtered = df.filter(start_cond & end_cond)
-print('rows after time filter:', df_filtered.height)
+    lf = pl.scan_parquet(str(p / '**' / '*.parquet'), hive_partitioning=True, parallel="row_groups")
+
+    # 場合分けで安全に Datetime に変換: まず速い str.strptime を試し、ダメなら pandas.to_datetime を使う
+    t = lf.collect_schema().get('snapshot_ts')
+    print('snapshot_ts schema:', t)
+    if t != pl.Datetime:
+        # 明示的な format 指定で Rust パーサの format 推定を省く
+        # （per-row の pandas.to_datetime フォールバックは使わない）
+        lf = lf.with_columns(
+            pl.col('snapshot_ts').str.to_datetime(format="%Y-%m-%dT%H:%M:%S%.f", strict=False, exact=False).alias('snapshot_ts')
+        )
+        print('parsing snapshot_ts with pl.str.to_datetime')
+    else:
+        print('snapshot_ts already Datetime')
+
+    # parsing に失敗した行の除去と時刻フィルタ（各日の 05:30〜23:59）を
+    # 同じ遅延プランに積んで一度の collect で実行する
+    # hour/minute を別々に取り出す代わりに dt.time() の 1 回比較で済ませる
+    time_cond = pl.col('snapshot_ts').dt.time().is_between(dt.time(5, 30), dt.time(23, 59, 59))
+    df_filtered = (
+        lf.filter(pl.col('snapshot_ts').is_not_null())
+          .filter(time_cond)
+          .collect(engine="streaming")
+    )
+    print('rows after time filter:', df_filtered.height)
+    df_filtered.write_ipc(str(cache_p), compression='lz4')
+
+df = df_filtered
 
 # 緯度経度整備と表示サンプル
 df_plot = df_filtered.with_columns([pl.col('lat').alias('latitude'), pl.col('lon').alias('longitude')]).drop_nulls(['latitude','longitude'])
@@ -301,21 +383,18 @@ display(df_plot.schema)
 # %%
 # data visualization
 
-pdf = df_plot.to_pandas()
-
-# snapshot_ts を pandas の datetime に（念のため）
-pdf["snapshot_ts"] = pd.to_datetime(pdf["snapshot_ts"])
-
-# 1分ごとの件数を集計
+# 1分ごとの件数を polars の group_by_dynamic で集計し、
+# 小さな集計結果だけを pandas/matplotlib に渡す（全行の to_pandas を回避）
 counts = (
-    pdf.set_index("snapshot_ts")
-       .resample("1min")
-       .size()
+    df_plot.sort("snapshot_ts")
+           .group_by_dynamic("snapshot_ts", every="1m")
+           .agg(pl.len().alias("n"))
+           .to_pandas()
 )
 
 # プロット
 plt.figure(figsize=(10, 4))
-counts.plot()
+plt.plot(counts["snapshot_ts"], counts["n"])
 plt.xlabel("time")
 plt.ylabel("count per minute")
 plt.title("Number of records per minute")
@@ -337,13 +416,33 @@ df_plot = df_filtered.select([
     pl.col('route_id'),
 ]).drop_nulls(['lat', 'lon'])
 
-pdf = df_plot.to_pandas()
-pdf = pdf.sample(n=20000, random_state=0)
-# Unix timestamp (ミリ秒) を別列として追加
-pdf['timestamp'] = pd.to_datetime(pdf['snapshot_ts']).astype('int64') // 10**6
+# 車両ごとに 5 秒粒度へ間引いてから可視化へ渡す:
+# Kepler/Plotly の描画コストとブラウザ payload は点数に比例するので
+# 形を保ったままポイント数を先に落とす
+df_plot = (
+    df_plot.group_by(['vehicle_id', pl.col('snapshot_ts').dt.truncate('5s')])
+           .agg(pl.col('lat').first(), pl.col('lon').first(), pl.col('route_id').first())
+)
+
+# pandas 変換前に polars 側でサンプリングして、変換コストを 2 万行分に抑える
+# Unix timestamp と HTML 保存用の文字列化も polars の Datetime 列から直接作る
+# timestamp は秒精度の Int32 に落とす: save_to_html が HTML に埋め込む
+# JSON の桁数が半分になり、ブラウザの JSON.parse も軽くなる
+# （epoch 秒は 2038 年まで Int32 に収まる; Kepler の time filter は秒も解釈する）
+pdf = (
+    df_plot.sample(n=min(20_000, df_plot.height), seed=0, shuffle=True)
+           .with_columns(
+               pl.col('snapshot_ts').dt.epoch('s').cast(pl.Int32).alias('timestamp'),
+               pl.col('snapshot_ts').cast(pl.Utf8),
+           )
+           .to_pandas(use_pyarrow_extension_array=True)
+)
 
-# 元の snapshot_ts は文字列に変換（HTML保存用）
-pdf['snapshot_ts'] = pdf['snapshot_ts'].astype(str)
+# Arrow-backed 拡張列のままだと可視化側の validator が要素ごとの Python
+# ループに落ちることがあるので、座標列は連続した float64 numpy 配列に戻す
+# （numpy 配列は buffer protocol 経由の fast path に乗る）
+for _c in ('lat', 'lon'):
+    pdf[_c] = pdf[_c].to_numpy(dtype=np.float64, copy=False)
 
 
 m = KeplerGl(height=600)
@@ -362,49 +461,46 @@ print("Saved to kepler_map.html")
 # ### 3.2.2. 1day (Config後単独実行可)
 
 # %%
-# combined parquet から読み込み
-p = Path.home() / 'adaptive-signal-open-data' / 'data' / 'bronze' / 'chitetsu_tram' / 'combined_tram_vp' / 'combined_tram_vp.parquet'
-df = pl.read_parquet(str(p))
-print('total rows:', df.height)
+# combined パーティションから遅延読み込み
+p = Path.home() / 'adaptive-signal-open-data' / 'data' / 'bronze' / 'chitetsu_tram' / 'combined_tram_vp'
+lf = pl.scan_parquet(str(p / '**' / '*.parquet'), hive_partitioning=True, parallel="row_groups")
 
-# snapshot_ts を Datetime に変換
-t = df.schema.get('snapshot_ts')
+# snapshot_ts を Datetime に変換（format 明示で推定コストを省く）
+t = lf.collect_schema().get('snapshot_ts')
 if t != pl.Datetime:
-    df = df.with_columns(pl.col('snapshot_ts').str.strptime(pl.Datetime, strict=False).alias('snapshot_ts'))
-
-df = df.filter(pl.col('snapshot_ts').is_not_null())
-
-# 11/10のデータのみに絞り込み
-df = df.filter(
-    (pl.col('snapshot_ts').dt.year() == 2025) &
-    (pl.col('snapshot_ts').dt.month() == 11) &
-    (pl.col('snapshot_ts').dt.day() == 10)
+    lf = lf.with_columns(
+        pl.col('snapshot_ts').str.to_datetime(format="%Y-%m-%dT%H:%M:%S%.f", strict=False, exact=False).alias('snapshot_ts')
+    )
+
+# 11/10のデータのみに絞り込み: 日付の範囲述語を collect 前に積むと
+# snapshot_ts の min/max statistics で対象日以外の row-group が丸ごと
+# スキップされる（dt.year/month/day の等値比較では pushdown されない）
+day = dt.datetime(2025, 11, 10)
+next_day = day + dt.timedelta(days=1)
+
+# 時刻フィルタ（05:30〜23:59）と Kepler.gl 用の projection も
+# 同じ遅延プランに積んで一度の collect で実行する
+df_plot = (
+    lf.filter(pl.col('snapshot_ts').is_not_null())
+      .filter((pl.col('snapshot_ts') >= day) & (pl.col('snapshot_ts') < next_day))
+      .filter(pl.col('snapshot_ts').dt.time().is_between(dt.time(5, 30), dt.time(23, 59, 59)))
+      .select(['lat', 'lon', 'snapshot_ts', 'vehicle_id', 'route_id'])
+      .drop_nulls(['lat', 'lon'])
+      .collect()
+)
+print('rows after date+time filter (11/10):', df_plot.height)
+
+# Unix timestamp (秒精度の Int32) と JSON serializable な文字列を polars 側で作ってから変換
+# Arrow 経由 + self_destruct で polars 側バッファを解放しながら pandas 化
+# （変換中のピークメモリをほぼ半減できる; Kepler は素の pandas を要求する）
+pdf = (
+    df_plot.with_columns(
+        pl.col('snapshot_ts').dt.epoch('s').cast(pl.Int32).alias('timestamp'),
+        pl.col('snapshot_ts').cast(pl.Utf8),
+    )
+    .to_arrow()
+    .to_pandas(split_blocks=True, self_destruct=True)
 )
-print('rows after date filter (11/10):', df.height)
-
-# 時刻フィルタ（05:30〜23:59）
-hour = pl.col('snapshot_ts').dt.hour()
-minute = pl.col('snapshot_ts').dt.minute()
-start_cond = (hour > 5) | ((hour == 5) & (minute >= 30))
-end_cond = (hour <= 23)
-df_filtered = df.filter(start_cond & end_cond)
-print('rows after time filter:', df_filtered.height)
-
-# Kepler.gl用に準備
-df_plot = df_filtered.select([
-    pl.col('lat'),
-    pl.col('lon'),
-    pl.col('snapshot_ts'),
-    pl.col('vehicle_id'),
-    pl.col('route_id'),
-]).drop_nulls(['lat', 'lon'])
-
-pdf = df_plot.to_pandas()
-
-# Unix timestamp (ミリ秒) を別列として追加
-pdf['timestamp'] = pd.to_datetime(pdf['snapshot_ts']).astype('int64') // 10**6
-# snapshot_ts を文字列に変換（JSON serializable にする）
-pdf['snapshot_ts'] = pdf['snapshot_ts'].astype(str)
 
 
 m = KeplerGl(height=600)
@@ -444,29 +540,31 @@ df = pl.read_parquet(p_tram_vp_1201)
 print(df.schema)
 print(df.shape)
 
-pdf = df.to_pandas()
-
-# snapshot_ts を pandas の datetime
-pdf["snapshot_ts"] = pd.to_datetime(pdf["snapshot_ts"])
-
-# 1分ごとの件数を集計
+# 1分ごとの件数を polars 側で集計（全行の to_pandas を回避）
 counts = (
-    pdf.set_index("snapshot_ts")
-       .resample("1min")
-       .size()
+    df.sort("snapshot_ts")
+      .group_by_dynamic("snapshot_ts", every="1m")
+      .agg(pl.len().alias("n"))
+      .to_pandas()
 )
 
 # plot
 plt.figure(figsize=(10, 4))
-counts.plot()
+plt.plot(counts["snapshot_ts"], counts["n"])
 plt.xlabel("time")
 plt.ylabel("count per minute")
 plt.title("Number of records per minute")
 plt.tight_layout()
 plt.show()
 
-sorted_df = df.sort("snapshot_ts")
-display(sliced_df.head(100).to_pandas())
+# 全件の in-memory ソートはせず、streaming エンジンで先頭 100 行だけ取り出す
+sorted_head = (
+    pl.scan_parquet(p_tram_vp_1201)
+      .sort("snapshot_ts")
+      .head(100)
+      .collect(engine="streaming")
+)
+display(sorted_head.to_pandas())
 
 
 # %%
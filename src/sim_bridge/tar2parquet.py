@@ -4,19 +4,28 @@ Extract JSON from tar archives and save as normalized Parquet files (DuckDB-acce
 tarアーカイブからJSONを抽出し、正規化されたParquetファイルとして保存（DuckDB高速化版）
 """
 import argparse
+import functools
 import tarfile
 import os
+import gzip
+import hashlib
 import json
+import re
 from pathlib import Path
 from typing import List, Dict, Set, Tuple, Optional
 import io
+import mmap
 import tempfile
 import shutil
+import gc
 from collections import defaultdict
 from datetime import datetime
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import polars as pl
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 
 try:
     import duckdb
@@ -31,11 +40,55 @@ try:
     HAS_TQDM = True
 except ImportError:
     HAS_TQDM = False
+
 try:
-    from tqdm import tqdm
-    HAS_TQDM = True
+    import orjson
+    HAS_ORJSON = True
 except ImportError:
-    HAS_TQDM = False
+    HAS_ORJSON = False
+
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+
+@functools.lru_cache(maxsize=32)
+def _resolve(raw: str) -> Path:
+    """
+    Expand ~ and environment variables in a CLI path, cached per string
+    CLIパスの~と環境変数を展開する（同じ文字列はキャッシュから返す）
+    """
+    return Path(os.path.expandvars(os.path.expanduser(raw))).resolve()
+
+
+def detect_workers() -> int:
+    """
+    Auto-detect a safe worker count from the CPUs actually available
+    実際に利用可能なCPU数から安全なワーカー数を自動検出する
+
+    os.cpu_count() reports the host's core count even inside a
+    cgroup-limited container; sched_getaffinity(0) reflects the CPUs this
+    process is allowed to run on. When psutil is available the count is
+    additionally capped by free memory at roughly 2 GB per worker so a
+    large archive cannot push the box into swap.
+    """
+    try:
+        n = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not available on this platform (e.g. macOS) / 非Linux環境向け
+        n = os.cpu_count() or 4
+    if HAS_PSUTIL:
+        available_gb = psutil.virtual_memory().available // (1024 ** 3)
+        n = min(n, max(1, available_gb // 2))
+    return max(1, n)
 
 
 # Reuse all JSON parsing logic from existing module
@@ -43,10 +96,422 @@ except ImportError:
 from gtfsrt_json2Parquet import (
     load_trip_updates_from_json,
     load_vehicle_positions_from_json,
-    save_to_parquet_partitioned,
 )
 
 
+def list_agencies(tar_path: Path) -> List[str]:
+    """
+    Discover agencies from tar member names without parsing any JSON
+    JSONを解析せずにtarメンバー名からagencyを検出する
+
+    The bronze archives encode the agency as the first path component of
+    every member (agency/feed_type/....json), so discovery only needs the
+    512-byte tar headers: one forward pass over the archive, skipping every
+    member body, instead of decompressing and parsing each snapshot.
+    agencyはメンバーパスの先頭ディレクトリに入っているため、tarヘッダーの
+    走査だけで検出でき、各JSON本体の展開・解析を完全に省略できる
+    """
+    buffer_size = 4 * 1024 * 1024
+    raw = open(tar_path, 'rb', buffering=buffer_size)
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(raw.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+    if str(tar_path).endswith('.gz') or str(tar_path).endswith('.tgz'):
+        stream = io.BufferedReader(gzip.GzipFile(fileobj=raw), buffer_size=buffer_size)
+        mode = 'r|'
+    else:
+        stream = raw
+        mode = 'r|*'
+    agencies: Set[str] = set()
+    counts: Dict[str, int] = defaultdict(int)
+    with tarfile.open(fileobj=stream, mode=mode, bufsize=buffer_size) as tar:
+        for member in tar:
+            if not member.name.endswith('.json'):
+                continue
+            path_parts = member.name.split('/')
+            if len(path_parts) >= 2:
+                agencies.add(path_parts[0])
+                counts[path_parts[0]] += 1
+    stream.close()
+    if stream is not raw:
+        raw.close()
+
+    print(f"\n{'='*60}")
+    print("Detected agencies in tar file:")
+    print(f"{'='*60}")
+    for agency in sorted(agencies):
+        print(f"  - {agency}: {counts[agency]} files")
+    print(f"{'='*60}\n")
+    print("Agency detection complete. Use --agency-filter to filter specific agencies.")
+    return sorted(agencies)
+
+
+def _parse_pax_path(payload: bytes) -> Optional[bytes]:
+    """
+    Extract the 'path' record from a pax extended header payload
+    pax拡張ヘッダーのペイロードから'path'レコードを取り出す
+
+    Records are "<len> <key>=<value>\n" where <len> counts the whole
+    record including the length digits and newline.
+    """
+    pos = 0
+    path = None
+    while pos < len(payload):
+        space = payload.find(b' ', pos)
+        if space == -1:
+            break
+        try:
+            rec_len = int(payload[pos:space])
+        except ValueError:
+            break
+        if rec_len <= 0 or pos + rec_len > len(payload):
+            break
+        key_val = payload[space + 1:pos + rec_len - 1]
+        key, _, value = key_val.partition(b'=')
+        if key == b'path':
+            path = value
+        pos += rec_len
+    return path
+
+
+def _iter_tar_json_mmap(tar_path: Path, allowed_agencies: Optional[Set[str]] = None):
+    """
+    mmap-based variant of _iter_tar_json for uncompressed .tar archives
+    非圧縮.tarアーカイブ向けの_iter_tar_json（mmap版）
+
+    With no decompressor in the way the archive is just fixed 512-byte
+    header blocks plus payloads, so the walker maps the file once and
+    strides from header to header, touching only the pages it slices.
+    This skips tarfile's per-member buffer copies entirely; payload bytes
+    are sliced straight out of the page cache.
+    圧縮がない場合、tarは512バイト固定ヘッダーとペイロードの並びに過ぎない
+    ため、ファイルを一度mmapしてヘッダーからヘッダーへ直接ストライドする
+    （tarfileのメンバーごとのバッファコピーを完全に省略できる）
+    """
+    with open(tar_path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            return
+    try:
+        if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            try:
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            except OSError:
+                pass
+        total = len(mm)
+        pos = 0
+        pending_longname = None
+        while pos + 512 <= total:
+            header = mm[pos:pos + 512]
+            if header[0] == 0:
+                # Two zero blocks mark end-of-archive; one is enough to stop
+                break
+            try:
+                size = int(header[124:136].split(b'\0')[0].strip() or b'0', 8)
+            except ValueError:
+                break
+            typeflag = header[156:157]
+            data_start = pos + 512
+            data_end = data_start + size
+            # Payloads are padded out to the 512-byte block grid
+            pos = data_start + ((size + 511) & ~511)
+
+            if typeflag == b'L':
+                # GNU long-name record: payload is the next member's name
+                pending_longname = mm[data_start:data_end].rstrip(b'\0')
+                continue
+            if typeflag == b'x':
+                # pax extended header: a 'path' record overrides the next
+                # member's (possibly truncated) header name
+                # pax拡張ヘッダー：'path'レコードが次メンバー名を上書きする
+                pax_path = _parse_pax_path(mm[data_start:data_end])
+                if pax_path:
+                    pending_longname = pax_path
+                continue
+            if typeflag == b'g':
+                # pax global defaults: nothing this walker uses; must not
+                # clear a pending name override / 保留中の名前上書きは保持
+                continue
+            if typeflag not in (b'0', b'\0'):
+                # Directories, links, ... / 通常ファイル以外
+                pending_longname = None
+                continue
+
+            if pending_longname is not None:
+                name_bytes = pending_longname
+                pending_longname = None
+            else:
+                name_bytes = header[0:100].split(b'\0', 1)[0]
+                prefix = header[345:500].split(b'\0', 1)[0]
+                if prefix:
+                    name_bytes = prefix + b'/' + name_bytes
+            name = name_bytes.decode('utf-8', 'surrogateescape')
+
+            # Same member gating as the tarfile-based iterator
+            # tarfile版イテレーターと同じメンバー判定
+            if not name.endswith('.json'):
+                continue
+            if 'trip_update' in name:
+                feed_type = 'trip_updates'
+            elif 'vehicle_position' in name:
+                feed_type = 'vehicle_positions'
+            else:
+                continue
+            if allowed_agencies:
+                path_parts = name.split('/')
+                likely_agency = path_parts[0] if len(path_parts) > 1 else None
+                if likely_agency and likely_agency not in allowed_agencies:
+                    continue
+
+            content = mm[data_start:data_end]
+            base = os.path.basename(name)
+            canon_name = base if _NAME_RE.match(base) else _canonicalize_name_for_parser(name, feed_type, content)
+            yield canon_name, content, feed_type
+    finally:
+        mm.close()
+
+
+def _iter_tar_json(tar_path: Path, allowed_agencies: Optional[Set[str]] = None):
+    """
+    Stream (canon_name, content, feed_type) tuples for JSON members of a tar
+    archive, where canon_name already matches the parser's filename pattern
+    tarアーカイブ内のJSONメンバーを(canon_name, content, feed_type)として
+    ストリームで返す（canon_nameはパーサーのファイル名パターンに正規化済み）
+
+    Uses streaming mode ('r|*') so the archive is read in a single forward
+    pass and only one member's bytes are in flight at a time, instead of
+    pinning the whole decompressed archive in memory up front.
+    ストリーミングモード('r|*')でアーカイブを前方一方向に読み、
+    展開済みバイト列を一度に1メンバー分しか保持しない
+
+    The stream is read through 4 MB buffers: tarfile's default 16 KiB
+    copy buffer issues many small reads (and small inflate calls for .gz),
+    so a large block-aligned buffer on both sides of the decompressor
+    amortizes the syscall and zlib state overhead.
+    tarfileの既定16KiBバッファは細かいreadとinflate呼び出しを大量に出すので、
+    展開の前後とも4MBのブロック境界バッファを通して読む
+    """
+    # Uncompressed archives take the mmap fast path: no decompressor, no
+    # tarfile buffer churn / 非圧縮tarはmmapの高速パスで処理する
+    if str(tar_path).endswith('.tar'):
+        yield from _iter_tar_json_mmap(tar_path, allowed_agencies)
+        return
+
+    buffer_size = 4 * 1024 * 1024
+    raw = open(tar_path, 'rb', buffering=buffer_size)
+    # Tell the kernel this is one sequential sweep so it doubles readahead
+    # and drops pages behind us (Linux/macOS; no-op elsewhere)
+    # 一方向のシーケンシャル読みであることをカーネルへ伝えてreadaheadを広げる
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(raw.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+    if str(tar_path).endswith('.gz') or str(tar_path).endswith('.tgz'):
+        stream = io.BufferedReader(gzip.GzipFile(fileobj=raw), buffer_size=buffer_size)
+        mode = 'r|'
+    else:
+        stream = raw
+        mode = 'r|*'
+    # bufsize sets tarfile's internal _Stream copy block; the default 20 KiB
+    # re-slices bytes per block on the hot read path, so match it to the
+    # outer 4 MB buffer (512-aligned, the tar block size)
+    # tarfile内部のコピーブロックも外側と同じ4MB（512の倍数）に合わせる
+    with tarfile.open(fileobj=stream, mode=mode, bufsize=buffer_size) as tar:
+        for member in tar:
+            # Cheap suffix test first; most non-JSON members never reach
+            # the TarInfo type check
+            # まず安価な拡張子判定で大半の非JSONメンバーを弾く
+            if not member.name.endswith('.json'):
+                continue
+            if not member.isfile():
+                continue
+
+            # Infer feed type from filename / ファイル名からfeed typeを推測
+            if 'trip_update' in member.name:
+                feed_type = 'trip_updates'
+            elif 'vehicle_position' in member.name:
+                feed_type = 'vehicle_positions'
+            else:
+                continue
+
+            # Collector archives lay members out as {agency}/gtfs_rt_....json,
+            # so filtered agencies can be dropped before the payload is even
+            # decompressed. The post-parse filter stays as a safety net for
+            # archives with a different layout.
+            # アーカイブは{agency}/gtfs_rt_...という構成なので、フィルタ対象外の
+            # agencyは展開前にスキップできる（解析後のフィルタは保険として残す）
+            if allowed_agencies:
+                path_parts = member.name.split('/')
+                likely_agency = path_parts[0] if len(path_parts) > 1 else None
+                if likely_agency and likely_agency not in allowed_agencies:
+                    continue
+
+            # Extract content / 内容を抽出
+            try:
+                fobj = tar.extractfile(member)
+                if fobj is None:
+                    continue
+                content = fobj.read()
+            except Exception:
+                continue
+
+            # Canonicalize here, in the parent, so pool workers only parse:
+            # the basename fast path makes this a regex test for well-named
+            # archives, and non-canonical names pay their JSON probe once
+            # instead of once per worker dispatch
+            # 正規化は親プロセス側で済ませ、ワーカーは解析だけを行う
+            base = os.path.basename(member.name)
+            canon_name = base if _NAME_RE.match(base) else _canonicalize_name_for_parser(member.name, feed_type, content)
+            yield canon_name, content, feed_type
+    stream.close()
+    raw.close()
+
+
+def _set_parquet_options(compression: str, level: int, output_format: str = 'parquet') -> None:
+    """Apply CLI writer tuning to the module-level defaults."""
+    global _PARQUET_COMPRESSION, _PARQUET_LEVEL, _OUTPUT_FORMAT
+    _PARQUET_COMPRESSION = compression
+    _PARQUET_LEVEL = level
+    _OUTPUT_FORMAT = output_format
+
+
+def _set_duckdb_options(mem_gb: int, tmp_dir: Optional[str]) -> None:
+    """Apply CLI DuckDB tuning to the module-level defaults."""
+    global _DUCKDB_MEM_GB, _DUCKDB_TMP
+    _DUCKDB_MEM_GB = mem_gb
+    _DUCKDB_TMP = tmp_dir
+
+
+def _duckdb_temp_dir() -> str:
+    """
+    Pick DuckDB's spill directory: explicit --duckdb-tmp, else a tmpfs RAM
+    disk when the platform has one, else the system temp dir
+    DuckDBのスピル先を選ぶ（明示指定 > /dev/shmのRAMディスク > 一時ディレクトリ）
+
+    Spilling to /dev/shm keeps an oversized working set off the root
+    partition, where DuckDB's random small writes would fight the Parquet
+    output for NVMe bandwidth.
+    /dev/shmへのスピルでルートパーティションへの細かいランダム書き込みを避ける
+    """
+    if _DUCKDB_TMP:
+        path = Path(_DUCKDB_TMP)
+    elif os.path.isdir('/dev/shm'):
+        path = Path('/dev/shm/duckdb_tmp')
+    else:
+        return tempfile.gettempdir()
+    path.mkdir(parents=True, exist_ok=True)
+    return str(path)
+
+
+def _writer_stats_columns(schema: pa.Schema) -> List[str]:
+    """
+    Columns to write Parquet statistics for: every non-string column plus
+    the key string columns in _STATS_COLUMNS
+    統計を書き出す列（非文字列の全列とキー文字列列のみ）
+    """
+    return [
+        name for name in schema.names
+        if name in _STATS_COLUMNS or not pa.types.is_string(schema.field(name).type)
+    ]
+
+
+def _write_feather_partitioned(combined: pl.DataFrame, output_dir: Path, feed_type: str,
+                               allowed_agencies: Optional[Set[str]] = None) -> int:
+    """
+    Arrow IPC (Feather v2) variant of the partitioned writer
+    パーティション書き出しのArrow IPC（Feather v2）版
+
+    The partition slices stay Arrow-backed end to end (polars frame →
+    to_arrow() → write_feather), so downstream polars/pandas consumers can
+    memory-map the files back without a Parquet decode pass.
+    パーティションはArrowのまま書き出すため、下流はParquetデコードなしで
+    メモリマップ読み込みできる
+    """
+    if allowed_agencies and 'agency' in combined.columns:
+        combined = combined.filter(pl.col('agency').is_in(sorted(allowed_agencies)))
+    saved_files = 0
+    for (agency, date_str), part in combined.partition_by(
+            ['agency', 'date_str_jst'], as_dict=True, maintain_order=False).items():
+        dest_dir = output_dir / agency / feed_type
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        feather.write_feather(part.to_arrow(), dest_dir / f"{date_str}.arrow", compression='zstd')
+        print(f"  [{agency}] Saved {feed_type} to {date_str}.arrow")
+        saved_files += 1
+    return saved_files
+
+
+def _duckdb_copy_partitioned(conn, combined: pl.DataFrame, output_dir: Path, feed_type: str,
+                             allowed_agencies: Optional[Set[str]] = None) -> int:
+    """
+    Write a combined frame as partitioned Parquet via DuckDB's parallel COPY
+    DuckDBの並列COPYで結合済みフレームをパーティション化Parquetとして書き出す
+
+    DuckDB shuffles by (agency, date_str_jst) and writes every partition
+    concurrently across its thread pool, then the hive-style output is
+    renamed into the bronze layout ({agency}/{feed_type}/{date}.parquet)
+    so downstream readers are unaffected. The agency filter is pushed
+    into the COPY's WHERE clause so filtered-out rows are dropped inside
+    the pipeline instead of materializing a filtered copy first.
+    DuckDBが(agency, date_str_jst)でシャッフルして全パーティションを並列に
+    書き出し、その後hive形式の出力をbronzeレイアウトへ改名する
+    （agencyフィルターはCOPYのWHERE句へプッシュダウンする）
+    """
+    if _OUTPUT_FORMAT == 'arrow_ipc':
+        return _write_feather_partitioned(combined, output_dir, feed_type, allowed_agencies)
+
+    # Unique staging dir per invocation: the directory batch mode runs
+    # several archives into the same output_dir concurrently, and a shared
+    # staging path would let one worker delete or rename another's
+    # in-flight partition files
+    # 呼び出しごとに一意なステージングディレクトリを使う（ディレクトリ一括
+    # モードでは複数ワーカーが同じoutput_dirへ並行書き込みするため）
+    tmp_root = Path(tempfile.mkdtemp(prefix=f'_duckdb_{feed_type}_', dir=output_dir))
+
+    # COMPRESSION_LEVEL is only meaningful for zstd / レベル指定はzstdのみ
+    compression_opts = f"COMPRESSION '{_PARQUET_COMPRESSION}', "
+    if _PARQUET_COMPRESSION == 'zstd':
+        compression_opts += f"COMPRESSION_LEVEL {_PARQUET_LEVEL}, "
+
+    where = ''
+    params = []
+    if allowed_agencies and 'agency' in combined.columns:
+        where = 'WHERE agency = ANY(?::VARCHAR[])'
+        params = [sorted(allowed_agencies)]
+
+    # Arrow zero-copy handoff into DuckDB / ArrowのゼロコピーでDuckDBへ渡す
+    conn.register('combined_feed', combined.to_arrow())
+    conn.execute(
+        f"COPY (SELECT * FROM combined_feed {where}) TO '{tmp_root}' "
+        "(FORMAT PARQUET, PARTITION_BY (agency, date_str_jst), "
+        f"OVERWRITE_OR_IGNORE, {compression_opts}"
+        "ROW_GROUP_SIZE 1000000, WRITE_PARTITION_COLUMNS true)",
+        params,
+    )
+    conn.unregister('combined_feed')
+
+    # Rename hive partitions into the bronze layout (metadata-only moves)
+    saved_files = 0
+    for part_dir in sorted(tmp_root.glob('agency=*/date_str_jst=*')):
+        agency = part_dir.parent.name.split('=', 1)[1]
+        date_str = part_dir.name.split('=', 1)[1]
+        dest_dir = output_dir / agency / feed_type
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        # DuckDB may emit several data files for one partition; suffix the
+        # extras instead of clobbering the first
+        # 1パーティションに複数ファイルが出る場合は連番を付けて退避する
+        for idx, part_file in enumerate(sorted(part_dir.glob('*.parquet'))):
+            dest_name = f"{date_str}.parquet" if idx == 0 else f"{date_str}_{idx}.parquet"
+            shutil.move(str(part_file), dest_dir / dest_name)
+            saved_files += 1
+        print(f"  [{agency}] Saved {feed_type} to {date_str}.parquet")
+    shutil.rmtree(tmp_root, ignore_errors=True)
+    return saved_files
+
+
 def process_tar_with_duckdb(
     tar_path: Path,
     output_dir: Path,
@@ -77,13 +542,19 @@ def process_tar_with_duckdb(
     
     # Set thread count / スレッド数を設定
     if threads is None:
-        threads = os.cpu_count() or 4
+        threads = detect_workers()
     conn.execute(f"PRAGMA threads={threads};")
-    conn.execute("PRAGMA memory_limit='8GB';")
-    conn.execute(f"PRAGMA temp_directory='{tempfile.gettempdir()}';")
+    conn.execute(f"PRAGMA memory_limit='{_DUCKDB_MEM_GB}GB';")
+    conn.execute(f"PRAGMA temp_directory='{_duckdb_temp_dir()}';")
+    # Cap spill growth at twice the memory budget so a runaway query cannot
+    # fill the RAM disk / スピル上限はメモリ上限の2倍までに抑える
+    conn.execute(f"PRAGMA max_temp_directory_size='{_DUCKDB_MEM_GB * 2}GB';")
+    # Partitioned COPY does not need input order; dropping it lets DuckDB
+    # shuffle and write partitions fully in parallel
+    conn.execute("PRAGMA preserve_insertion_order=false;")
     
     print(f"DuckDB threads: {threads}")
-    print(f"Memory limit: 8GB")
+    print(f"Memory limit: {_DUCKDB_MEM_GB}GB")
     
     # Parse agency filter / agencyフィルターを解析
     allowed_agencies = None
@@ -91,99 +562,82 @@ def process_tar_with_duckdb(
         allowed_agencies = set(a.strip() for a in agency_filter.split(','))
         print(f"Filtering agencies: {allowed_agencies}")
     
-    # Track statistics / 統計情報を追跡
-    detected_agencies: Set[str] = set()
-    stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
-    
-    # Phase 1: Read all JSON files from tar into memory (DuckDB can't read tar directly)
-    # フェーズ1: tarから全JSONファイルをメモリに読み込む（DuckDBはtarを直接読めない）
-    print("\nPhase 1: Reading JSON files from tar...")
-    json_tasks: List[Tuple[str, bytes, str]] = []
-    total_size_bytes = 0
-    
-    with tarfile.open(tar_path, 'r:*') as tar:
-        members = [m for m in tar if m.isfile() and m.name.endswith('.json')]
-        total_members = len(members)
-        print(f"Total JSON files in tar: {total_members}")
-        
-        iterator = tqdm(members, desc="Reading tar") if HAS_TQDM else members
-        
-        for member in iterator:
-            # Infer feed type from filename / ファイル名からfeed typeを推測
-            if 'trip_update' in member.name:
-                feed_type = 'trip_updates'
-            elif 'vehicle_position' in member.name:
-                feed_type = 'vehicle_positions'
-            else:
-                continue
-            
-            # Extract content / 内容を抽出
-            try:
-                content = tar.extractfile(member).read()
-                total_size_bytes += len(content)
-                json_tasks.append((member.name, content, feed_type))
-            except Exception as e:
-                continue
-    
-    print(f"\nData size: {total_size_bytes / (1024**3):.2f} GB ({len(json_tasks)} files)")
-    print(f"Loaded {len(json_tasks)} JSON files into memory")
-    
-    # Phase 2: Parse JSON files using existing gtfsrt_json2Parquet functions
-    # フェーズ2: 既存のgtfsrt_json2Parquet関数を使用してJSONファイルを解析
-    print("\nPhase 2: Parsing JSON files with existing logic...")
-    
+    # Phase 1+2: Stream JSON files out of the tar and parse them as they
+    # arrive, fanned out over a process pool (Polars frame construction is
+    # CPU-bound Python work, so process-level parallelism scales with cores)
+    # フェーズ1+2: tarからJSONをストリームで取り出しながらプロセスプールで並列解析
+    print("\nPhase 1+2: Streaming and parsing JSON files from tar...")
+
     trip_updates_dfs: List[pl.DataFrame] = []
     vehicle_positions_dfs: List[pl.DataFrame] = []
     processed_count = 0
     skipped_count = 0
-    
-    iterator = json_tasks
-    if HAS_TQDM:
-        iterator = tqdm(json_tasks, desc="Parsing JSON")
-    
-    for filename, content, feed_type in iterator:
-        try:
-            # Create canonical filename so parser can extract timestamp
-            canon_name = _canonicalize_name_for_parser(filename, feed_type, content)
-            # Create mock path for compatibility / 互換性のためモックパスを作成
-            mock_path = _TarMockPath(canon_name, content)
-            
-            # Parse using existing functions / 既存関数を使用して解析
-            if feed_type == 'trip_updates':
-                df = load_trip_updates_from_json(mock_path)
-            else:
-                df = load_vehicle_positions_from_json(mock_path)
-            
-            if df.is_empty():
-                skipped_count += 1
-                continue
-            
-            # Detect agency / agencyを検出
-            agency = df['agency'][0] if 'agency' in df.columns else 'unknown'
-            detected_agencies.add(agency)
-            stats[agency][feed_type] += 1
-            
-            # Apply filter / フィルターを適用
-            if allowed_agencies and agency not in allowed_agencies:
-                skipped_count += 1
-                continue
-            
-            # Store DataFrame / DataFrameを保存
-            if feed_type == 'trip_updates':
-                trip_updates_dfs.append(df)
-            else:
-                vehicle_positions_dfs.append(df)
-            
-            processed_count += 1
-        
-        except Exception as e:
-            skipped_count += 1
-            continue
-    
-    # Show statistics / 統計情報を表示
+    total_files = 0
+
+    # Spill payloads to a scratch file so the bulk bytes never cross the
+    # pool's IPC pipe; workers mmap the file and slice it in place
+    # ペイロードをscratchファイルへ書き出し、ワーカーはmmapスライスで読む
+    scratch_path, tasks = _spill_tar_to_scratch(tar_path, allowed_agencies)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=threads, initializer=_init_worker_mmap, initargs=(scratch_path,)
+        ) as executor:
+            results = executor.map(_process_single_json_mmap, tasks, chunksize=_MAP_CHUNKSIZE)
+
+            iterator = results
+            if HAS_TQDM:
+                iterator = tqdm(results, total=len(tasks), desc="Parsing JSON")
+
+            for result in iterator:
+                total_files += 1
+                if result is None:
+                    skipped_count += 1
+                    continue
+
+                feed_type, df = result
+
+                # Store DataFrame; agency detection, statistics and the
+                # agency filter all run vectorized on the combined frames
+                # DataFrameを保存（agencyの検出・集計・フィルタは結合後に一括で行う）
+                if feed_type == 'trip_updates':
+                    trip_updates_dfs.append(df)
+                else:
+                    vehicle_positions_dfs.append(df)
+
+                processed_count += 1
+    finally:
+        os.unlink(scratch_path)
+
+    # Combine parsed frames once / 解析済みフレームを一度だけ結合する
+    # rechunk=False skips re-copying every column into one contiguous
+    # buffer (the writers handle chunked columns fine), and dropping the
+    # source lists right away releases half the working set
+    combined_tu = None
+    combined_vp = None
+    if trip_updates_dfs:
+        print(f"\nCombining {len(trip_updates_dfs)} trip_updates DataFrames...")
+        combined_tu = pl.concat(trip_updates_dfs, how="vertical_relaxed", rechunk=False)
+        trip_updates_dfs.clear()
+    if vehicle_positions_dfs:
+        print(f"Combining {len(vehicle_positions_dfs)} vehicle_positions DataFrames...")
+        combined_vp = pl.concat(vehicle_positions_dfs, how="vertical_relaxed", rechunk=False)
+        vehicle_positions_dfs.clear()
+    gc.collect()
+
+    # Derive the per-agency statistics with one Rust group-by per feed
+    # instead of two Python dict mutations per file in the hot loop
+    # 統計はホットループ内のdict更新ではなくgroup_byの一括集計で求める
+    stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for feed_type, combined in (('trip_updates', combined_tu), ('vehicle_positions', combined_vp)):
+        if combined is not None and 'agency' in combined.columns:
+            for agency, n in combined.group_by('agency').len().iter_rows():
+                stats[agency][feed_type] = n
+    detected_agencies = set(stats.keys())
+
+    # Show statistics (counts are records per agency) / 統計情報を表示（agencyごとのレコード数）
     print(f"\n{'='*60}")
     print(f"Processing Summary:")
-    print(f"  Total JSON files: {len(json_tasks)}")
+    print(f"  Total JSON files: {total_files}")
     print(f"  Successfully processed: {processed_count}")
     print(f"  Skipped: {skipped_count}")
     print(f"\nDetected Agencies:")
@@ -191,60 +645,36 @@ def process_tar_with_duckdb(
         tu_count = stats[agency]['trip_updates']
         vp_count = stats[agency]['vehicle_positions']
         print(f"  {agency}:")
-        print(f"    - trip_updates: {tu_count}")
-        print(f"    - vehicle_positions: {vp_count}")
+        print(f"    - trip_updates: {tu_count} records")
+        print(f"    - vehicle_positions: {vp_count} records")
     print(f"{'='*60}\n")
-    
+
     # If only showing agencies, exit here / agency検出のみの場合はここで終了
     if show_agencies:
         print("Agency detection complete. Use --agency-filter to filter specific agencies.")
         conn.close()
         return
-    
-    # Phase 3: Combine and save parquet files using DuckDB for faster I/O
-    # フェーズ3: DuckDBを使用してより高速にparquetファイルを結合・保存
+
+    # Phase 3: Save partitioned parquet files using DuckDB for faster I/O
+    # (the agency filter rides along as a pushed-down predicate in the COPY)
+    # フェーズ3: DuckDBを使用してより高速にパーティション化parquetを保存
+    # （agencyフィルターはCOPY内の述語としてプッシュダウンされる）
     print("Phase 3: Saving parquet files with DuckDB...")
     
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Save trip_updates / trip_updatesを保存
-    if trip_updates_dfs:
-        print(f"\nCombining {len(trip_updates_dfs)} trip_updates DataFrames...")
-        combined_tu = pl.concat(trip_updates_dfs, how="vertical")
+    if combined_tu is not None and combined_tu.height > 0:
         print(f"Total trip_updates records: {combined_tu.height}")
-        
-        saved_files = 0
-        for agency in sorted(combined_tu['agency'].unique()):
-            agency_df = combined_tu.filter(pl.col('agency') == agency)
-            
-            for date_str in sorted(agency_df['date_str'].unique()):
-                date_df = agency_df.filter(pl.col('date_str') == date_str)
-                out_path = save_to_parquet_partitioned(
-                    date_df, output_dir, agency, 'trip_updates', date_str
-                )
-                print(f"  [{agency}] Saved {date_df.height} trip_updates to {out_path.name}")
-                saved_files += 1
-        
+        saved_files = _duckdb_copy_partitioned(conn, combined_tu, output_dir, 'trip_updates',
+                                               allowed_agencies=allowed_agencies)
         print(f"Saved {saved_files} trip_updates parquet files")
     
     # Save vehicle_positions / vehicle_positionsを保存
-    if vehicle_positions_dfs:
-        print(f"\nCombining {len(vehicle_positions_dfs)} vehicle_positions DataFrames...")
-        combined_vp = pl.concat(vehicle_positions_dfs, how="vertical")
+    if combined_vp is not None and combined_vp.height > 0:
         print(f"Total vehicle_positions records: {combined_vp.height}")
-        
-        saved_files = 0
-        for agency in sorted(combined_vp['agency'].unique()):
-            agency_df = combined_vp.filter(pl.col('agency') == agency)
-            
-            for date_str in sorted(agency_df['date_str'].unique()):
-                date_df = agency_df.filter(pl.col('date_str') == date_str)
-                out_path = save_to_parquet_partitioned(
-                    date_df, output_dir, agency, 'vehicle_positions', date_str
-                )
-                print(f"  [{agency}] Saved {date_df.height} vehicle_positions to {out_path.name}")
-                saved_files += 1
-        
+        saved_files = _duckdb_copy_partitioned(conn, combined_vp, output_dir, 'vehicle_positions',
+                                               allowed_agencies=allowed_agencies)
         print(f"Saved {saved_files} vehicle_positions parquet files")
     
     conn.close()
@@ -261,8 +691,20 @@ class _TarMockPath:
         self._content = content
     
     def open(self, mode='r', encoding='utf-8'):
-        """Return file-like object for reading / 読み込み用のファイル風オブジェクトを返す"""
-        return io.TextIOWrapper(io.BytesIO(self._content), encoding=encoding)
+        """Return file-like object for reading / 読み込み用のファイル風オブジェクトを返す
+
+        Returns the raw BytesIO rather than a TextIOWrapper: json.load
+        accepts binary files and sniffs the encoding itself, so wrapping
+        would add a full incremental UTF-8 decode and str copy per file
+        for no benefit.
+        json.loadはバイナリファイルを受け付けるため、TextIOWrapperを挟んで
+        ファイルごとに余分なUTF-8デコードとstrコピーを払う必要はない
+        """
+        return io.BytesIO(self._content)
+    
+    def read_bytes(self) -> bytes:
+        """Return the raw bytes like pathlib.Path.read_bytes / 生のバイト列を返す"""
+        return self._content
 
 
 def _process_single_json(args: Tuple[str, bytes, str]) -> Optional[Tuple[str, pl.DataFrame]]:
@@ -271,15 +713,15 @@ def _process_single_json(args: Tuple[str, bytes, str]) -> Optional[Tuple[str, pl
     単一JSONファイルを処理（並列処理用）
     
     Args:
-        args: Tuple of (filename, content, feed_type)
+        args: Tuple of (canon_name, content, feed_type)
         
     Returns:
         Tuple of (feed_type, DataFrame) or None on error
     """
-    filename, content, feed_type = args
+    canon_name, content, feed_type = args
     
     try:
-        canon_name = _canonicalize_name_for_parser(filename, feed_type, content)
+        # The name was canonicalized by _iter_tar_json in the parent
         mock_path = _TarMockPath(canon_name, content)
         
         if feed_type == 'trip_updates':
@@ -297,18 +739,158 @@ def _process_single_json(args: Tuple[str, bytes, str]) -> Optional[Tuple[str, pl
         return None
 
 
+# Tasks handed to the process pool are batched so one IPC round-trip
+# carries many small JSON files; per-future dispatch would be dominated
+# by scheduling overhead on archives with 100k+ members.
+# プロセスプールへのタスクはまとめて送り、IPC往復あたりの件数を増やす
+_MAP_CHUNKSIZE = 64
+
+# Parquet writer tuning, overridable via --parquet-compression/--parquet-level
+# Parquet書き出し設定（--parquet-compression/--parquet-levelで上書き可能）
+_PARQUET_COMPRESSION = 'zstd'
+_PARQUET_LEVEL = 3
+_OUTPUT_FORMAT = 'parquet'
+
+# DuckDB memory budget and spill location (overridable via --duckdb-mem/--duckdb-tmp)
+# DuckDBのメモリ上限とスピル先（--duckdb-mem/--duckdb-tmpで上書き可能）
+_DUCKDB_MEM_GB = 8
+_DUCKDB_TMP: Optional[str] = None
+
+# Columns whose min/max statistics pay for themselves on filtered re-reads
+# (partition keys and join keys). Statistics on the remaining string-heavy
+# columns only bloat the file footers, so the writers skip them.
+# min/max統計が再読込のフィルターに効くキー列のみ統計を書く
+_STATS_COLUMNS = frozenset({'agency', 'date_str_jst', 'trip_id', 'route_id', 'stop_id', 'vehicle_id'})
+
+
+
+# Members whose basename already matches the parser's expected pattern
+# (with or without an agency segment) can skip canonicalization entirely.
+# パーサーの期待パターンに一致する名前のメンバーは正規化をスキップできる
+_NAME_RE = re.compile(r'^gtfs_rt_(trip_updates|vehicle_positions)_(?:.+_)?\d{8}_\d{6}\.json$')
+
+
+# Per-worker read-only mmap of the scratch file holding extracted payloads
+# 抽出済みペイロードを保持するscratchファイルのワーカーごとの読み取り専用mmap
+_SCRATCH_MM = None
+
+
+def _init_worker_mmap(scratch_path: str) -> None:
+    """Map the shared scratch file read-only in each pool worker.
+    各プールワーカーで共有scratchファイルを読み取り専用でmmapする
+    """
+    global _SCRATCH_MM
+    if os.path.getsize(scratch_path) == 0:
+        _SCRATCH_MM = None
+        return
+    f = open(scratch_path, 'rb')
+    _SCRATCH_MM = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _process_single_json_mmap(args: Tuple[int, int, str, str]) -> Optional[Tuple[str, pl.DataFrame]]:
+    """Parse one JSON payload addressed as an (offset, size) slice of the mmap.
+    mmap上の(offset, size)スライスとして渡されたJSONペイロードを解析する
+    """
+    offset, size, feed_type, canon_name = args
+    content = bytes(_SCRATCH_MM[offset:offset + size])
+    return _process_single_json((canon_name, content, feed_type))
+
+
+def _spill_tar_to_scratch(tar_path: Path, allowed_agencies: Optional[Set[str]] = None) -> Tuple[str, List[Tuple[int, int, str, str]]]:
+    """
+    Extract JSON payloads into one scratch file and return (path, tasks)
+    JSONペイロードを1つのscratchファイルへ書き出し、(path, tasks)を返す
+
+    Pool workers receive only (offset, size, feed_type, canon_name) tuples
+    and read the bytes from a shared read-only mmap, so the bulk tar
+    content crosses the process-pool pipe zero times instead of being
+    pickled into every dispatch.
+    ワーカーへは(offset, size, feed_type, canon_name)だけを渡し、本体の
+    バイト列は共有mmapから読む（大容量データがプールのIPCを通らない）
+    """
+    scratch = tempfile.NamedTemporaryFile(prefix='tar2parquet_scratch_', delete=False)
+    tasks: List[Tuple[int, int, str, str]] = []
+    try:
+        offset = 0
+        for canon_name, content, feed_type in _iter_tar_json(tar_path, allowed_agencies):
+            scratch.write(content)
+            tasks.append((offset, len(content), feed_type, canon_name))
+            offset += len(content)
+    finally:
+        scratch.close()
+    return scratch.name, tasks
+
+
+# Both fields normally sit in the file header (the first bytes of the feed),
+# so a bounded probe avoids decoding megabytes of entity arrays just to
+# rebuild the filename.
+_HEADER_TS_RE = re.compile(rb'"timestamp"\s*:\s*"?(\d+)')
+_FEED_NAME_RE = re.compile(rb'"feed_name"\s*:\s*"([^"]+)"')
+
+
 def _canonicalize_name_for_parser(original_name: str, feed_type: str, content: bytes) -> str:
     """Return a filename matching parser regex using JSON content.
 
     Output pattern with agency: gtfs_rt_{feed_type}_{agency}_{YYYYMMDD_HHMMSS}.json
     Output pattern without agency: gtfs_rt_{feed_type}_{YYYYMMDD_HHMMSS}.json
     Falls back to 19700101_000000 if timestamp not found.
+
+    Fast path: grab feed_name and the header timestamp with a regex probe
+    over the first 512 bytes; fall back to a full JSON parse (orjson when
+    available) only when the probe misses.
     """
     ts_str = "19700101_000000"
     agency = None
-    
+
+    # Header-only fast path / ヘッダーのみの高速パス
+    head = content[:512]
+    ts_m = _HEADER_TS_RE.search(head)
+    name_m = _FEED_NAME_RE.search(head)
+    if ts_m and name_m:
+        try:
+            fast_ts = datetime.utcfromtimestamp(int(ts_m.group(1))).strftime("%Y%m%d_%H%M%S")
+            fast_agency = name_m.group(1).decode("utf-8").replace("-", "_").replace(".", "_").strip()
+            if fast_agency:
+                return f"gtfs_rt_{feed_type}_{fast_agency}_{fast_ts}.json"
+        except Exception:
+            pass
+
+    # Streaming prefix parse: walk events only until the header fields are
+    # seen and stop before the entity array, so work scales with the JSON
+    # prefix instead of the full document
+    # ストリーミング解析: headerのフィールドを見つけたらentity配列の前で
+    # 打ち切るので、処理量はドキュメント全体ではなくprefix分で済む
+    if HAS_IJSON:
+        try:
+            ts = None
+            feed_name = None
+            for prefix, _event, value in ijson.parse(io.BytesIO(content)):
+                if ts is None and prefix in ('timestamp', 'header.timestamp'):
+                    ts = value
+                elif feed_name is None and prefix == 'feed_name':
+                    feed_name = value
+                elif prefix.startswith('entity'):
+                    # header precedes the entity array in GTFS-RT feeds
+                    break
+                if ts is not None and feed_name is not None:
+                    break
+            if ts is not None:
+                stream_ts = datetime.utcfromtimestamp(int(ts)).strftime("%Y%m%d_%H%M%S")
+                if feed_name and isinstance(feed_name, str):
+                    stream_agency = feed_name.replace("-", "_").replace(".", "_").strip()
+                    if stream_agency:
+                        return f"gtfs_rt_{feed_type}_{stream_agency}_{stream_ts}.json"
+                return f"gtfs_rt_{feed_type}_{stream_ts}.json"
+        except Exception:
+            pass
+
     try:
-        feed = json.loads(content.decode("utf-8", errors="ignore"))
+        # orjson parses the bytes directly (no utf-8 decode pass) and is
+        # several times faster than stdlib json on these payloads
+        if HAS_ORJSON:
+            feed = orjson.loads(content)
+        else:
+            feed = json.loads(content.decode("utf-8", errors="ignore"))
         
         if isinstance(feed, dict):
             # 1. Extract agency from feed_name field (highest priority)
@@ -390,135 +972,156 @@ def process_tar_to_normalized_parquet(
         allowed_agencies = set(a.strip() for a in agency_filter.split(','))
         print(f"Filtering agencies: {allowed_agencies}")
     
+    if _OUTPUT_FORMAT == 'arrow_ipc':
+        # Feather cannot be appended to, which the streaming writers rely on
+        # Featherは追記できないためストリーミング書き出しではParquetのまま
+        print("Warning: --output-format arrow_ipc requires the DuckDB path; writing Parquet")
+    
     # Track statistics / 統計情報を追跡
     detected_agencies: Set[str] = set()
     stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
     
-    # Phase 1: Read all JSON files from tar into memory
-    # フェーズ1: tarから全JSONファイルをメモリに読み込む
-    print("\nPhase 1: Reading JSON files from tar...")
-    json_tasks: List[Tuple[str, bytes, str]] = []
-    total_size_bytes = 0
-    
-    with tarfile.open(tar_path, 'r:*') as tar:
-        members = [m for m in tar if m.isfile() and m.name.endswith('.json')]
-        total_members = len(members)
-        print(f"Total JSON files in tar: {total_members}")
-        
-        iterator = tqdm(members, desc="Reading tar") if HAS_TQDM else members
-        
-        for member in iterator:
-            # Infer feed type from filename / ファイル名からfeed typeを推測
-            if 'trip_update' in member.name:
-                feed_type = 'trip_updates'
-            elif 'vehicle_position' in member.name:
-                feed_type = 'vehicle_positions'
-            else:
-                continue
-            
-            # Extract content / 内容を抽出
-            try:
-                content = tar.extractfile(member).read()
-                total_size_bytes += len(content)
-                json_tasks.append((member.name, content, feed_type))
-            except Exception as e:
-                continue
-    
     # Auto-detect optimal workers if not specified / 指定されていない場合は最適なワーカー数を自動検出
     if workers is None:
-        # Simple auto-detection: use 1 for small data, else use all cores
-        cpu_count = os.cpu_count() or 4
-        if len(json_tasks) < 1000 and total_size_bytes < 50 * 1024 * 1024:
-            workers = 1
-        else:
-            workers = cpu_count
-        print(f"\nData size: {total_size_bytes / (1024**3):.2f} GB ({len(json_tasks)} files)")
+        # Simple auto-detection: use 1 for small archives, else use every
+        # CPU this process is actually allowed to run on.
+        # The on-disk archive size stands in for the content size so we do not
+        # need a pre-pass over the tar just to count bytes.
+        # tarの中身を先読みせず、ディスク上のアーカイブサイズで判定する
+        archive_size = os.path.getsize(tar_path)
+        workers = 1 if archive_size < 50 * 1024 * 1024 else detect_workers()
+        print(f"\nArchive size: {archive_size / (1024**3):.2f} GB")
         print(f"Auto-detected optimal workers: {workers}")
     elif workers > 1:
-        print(f"\nData size: {total_size_bytes / (1024**3):.2f} GB ({len(json_tasks)} files)")
-        print(f"Using {workers} parallel workers")
-    
-    print(f"Loaded {len(json_tasks)} JSON files into memory")
-    
-    # Phase 2: Parse JSON files (parallel or sequential)
-    # フェーズ2: JSONファイルを解析（並列または逐次）
-    print("\nPhase 2: Parsing JSON files...")
-    
-    trip_updates_dfs: List[pl.DataFrame] = []
-    vehicle_positions_dfs: List[pl.DataFrame] = []
+        print(f"\nUsing {workers} parallel workers")
+
+    # Phase 1+2: Stream JSON files out of the tar, parse as they arrive
+    # (parallel or sequential) and append each parsed frame straight to an
+    # open per-(agency, date) ParquetWriter. No global accumulate+concat:
+    # peak memory is the in-flight batch plus one row-group per open writer.
+    # フェーズ1+2: tarからJSONをストリームで取り出して解析し、
+    # (agency, date)ごとに開いたParquetWriterへ逐次追記する
+    # （全体をリストに溜めてconcatしないのでピークメモリが抑えられる）
+    print("\nPhase 1+2: Streaming and parsing JSON files from tar...")
+
+    writers: Dict[Tuple[str, str, str], pq.ParquetWriter] = {}
+    schema_cache: Dict[Tuple[str, str, str], pa.Schema] = {}
     processed_count = 0
     skipped_count = 0
-    
-    if workers > 1:
-        # Parallel processing / 並列処理
-        with ProcessPoolExecutor(max_workers=workers) as executor:
-            futures = {executor.submit(_process_single_json, task): task for task in json_tasks}
-            
-            iterator = as_completed(futures)
+    total_files = 0
+
+    def _write_partitions(feed_type: str, df: pl.DataFrame) -> None:
+        # Append each (agency, date_str_jst) slice to its open writer
+        # (agency, date_str_jst)ごとのスライスを対応するwriterへ追記
+        for (agency, date_str), part in df.partition_by(['agency', 'date_str_jst'], as_dict=True, maintain_order=False).items():
+            tbl = part.to_arrow()
+            key = (agency, date_str, feed_type)
+            writer = writers.get(key)
+            if writer is None:
+                out_dir = output_dir / agency / feed_type
+                out_dir.mkdir(parents=True, exist_ok=True)
+                # The first batch fixes the writer schema; later batches are
+                # checked against the cached copy instead of the writer
+                # re-deriving compatibility per write
+                # 最初のバッチでスキーマを確定し、以降はキャッシュと比較する
+                schema_cache[key] = tbl.schema
+                writer = pq.ParquetWriter(
+                    out_dir / f"{date_str}.parquet", tbl.schema,
+                    compression=_PARQUET_COMPRESSION,
+                    compression_level=_PARQUET_LEVEL if _PARQUET_COMPRESSION == 'zstd' else None,
+                    use_dictionary=True,
+                    write_statistics=_writer_stats_columns(tbl.schema),
+                )
+                writers[key] = writer
+            elif tbl.schema != schema_cache[key]:
+                # Nullability/dtype drift between files: one cast to the
+                # writer schema instead of a write failure mid-archive
+                tbl = tbl.cast(schema_cache[key])
+            # 1M-row groups keep per-file metadata small without letting a
+            # single group grow unbounded on large partitions
+            writer.write_table(tbl, row_group_size=1_000_000)
+
+    try:
+        if workers > 1:
+            # Parallel processing / 並列処理
+            # ペイロードをscratchファイルへ書き出し、ワーカーはmmapスライスで読む
+            scratch_path, tasks = _spill_tar_to_scratch(tar_path, allowed_agencies)
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=workers, initializer=_init_worker_mmap, initargs=(scratch_path,)
+                ) as executor:
+                    results = executor.map(_process_single_json_mmap, tasks, chunksize=_MAP_CHUNKSIZE)
+
+                    iterator = results
+                    if HAS_TQDM:
+                        iterator = tqdm(results, total=len(tasks), desc="Parsing JSON")
+
+                    for result in iterator:
+                        total_files += 1
+                        if result is None:
+                            skipped_count += 1
+                            continue
+
+                        feed_type, df = result
+
+                        # Detect agency / agencyを検出
+                        agency = df['agency'][0] if 'agency' in df.columns else 'unknown'
+                        detected_agencies.add(agency)
+                        stats[agency][feed_type] += 1
+
+                        # Apply filter / フィルターを適用
+                        if allowed_agencies and agency not in allowed_agencies:
+                            skipped_count += 1
+                            continue
+
+                        # Stream to the partition writers / パーティションwriterへ逐次書き込み
+                        if not show_agencies:
+                            _write_partitions(feed_type, df)
+
+                        processed_count += 1
+            finally:
+                os.unlink(scratch_path)
+
+        else:
+            # Sequential processing / 逐次処理
+            iterator = _iter_tar_json(tar_path, allowed_agencies)
             if HAS_TQDM:
-                iterator = tqdm(iterator, total=len(json_tasks), desc="Parsing JSON")
-            
-            for future in iterator:
-                result = future.result()
+                iterator = tqdm(iterator, desc="Parsing JSON", unit="files")
+
+            for task in iterator:
+                total_files += 1
+                result = _process_single_json(task)
                 if result is None:
                     skipped_count += 1
                     continue
-                
+            
                 feed_type, df = result
-                
+            
                 # Detect agency / agencyを検出
                 agency = df['agency'][0] if 'agency' in df.columns else 'unknown'
                 detected_agencies.add(agency)
                 stats[agency][feed_type] += 1
-                
+            
                 # Apply filter / フィルターを適用
                 if allowed_agencies and agency not in allowed_agencies:
                     skipped_count += 1
                     continue
-                
-                # Store DataFrame / DataFrameを保存
-                if feed_type == 'trip_updates':
-                    trip_updates_dfs.append(df)
-                else:
-                    vehicle_positions_dfs.append(df)
-                
-                processed_count += 1
-    else:
-        # Sequential processing / 逐次処理
-        iterator = json_tasks
-        if HAS_TQDM:
-            iterator = tqdm(json_tasks, desc="Parsing JSON")
-        
-        for task in iterator:
-            result = _process_single_json(task)
-            if result is None:
-                skipped_count += 1
-                continue
-            
-            feed_type, df = result
             
-            # Detect agency / agencyを検出
-            agency = df['agency'][0] if 'agency' in df.columns else 'unknown'
-            detected_agencies.add(agency)
-            stats[agency][feed_type] += 1
+                # Stream to the partition writers / パーティションwriterへ逐次書き込み
+                if not show_agencies:
+                    _write_partitions(feed_type, df)
             
-            # Apply filter / フィルターを適用
-            if allowed_agencies and agency not in allowed_agencies:
-                skipped_count += 1
-                continue
-            
-            # Store DataFrame / DataFrameを保存
-            if feed_type == 'trip_updates':
-                trip_updates_dfs.append(df)
-            else:
-                vehicle_positions_dfs.append(df)
-            
-            processed_count += 1
-    
+                processed_count += 1
+    finally:
+        # Close every partition writer so footers land even on error
+        # エラー時もfooterが書かれるよう必ずwriterを閉じる
+        for writer in writers.values():
+            writer.close()
+
     # Show statistics / 統計情報を表示
     print(f"\n{'='*60}")
     print(f"Processing Summary:")
-    print(f"  Total JSON files: {len(json_tasks)}")
+    print(f"  Total JSON files: {total_files}")
     print(f"  Successfully processed: {processed_count}")
     print(f"  Skipped: {skipped_count}")
     print(f"\nDetected Agencies:")
@@ -535,49 +1138,46 @@ def process_tar_to_normalized_parquet(
         print("Agency detection complete. Use --agency-filter to filter specific agencies.")
         return
     
-    # Phase 3: Combine and save parquet files
-    # フェーズ3: 結合してparquetファイルを保存
+    # Phase 3: Writers already received the data during Phase 2; just report
+    # フェーズ3: データはフェーズ2で書き込み済みなので結果のみ表示
     print("Phase 3: Saving parquet files...")
     
-    # Save trip_updates / trip_updatesを保存
-    if trip_updates_dfs:
-        print(f"\nCombining {len(trip_updates_dfs)} trip_updates DataFrames...")
-        combined_tu = pl.concat(trip_updates_dfs, how="vertical")
-        print(f"Total trip_updates records: {combined_tu.height}")
-        
-        saved_files = 0
-        for agency in sorted(combined_tu['agency'].unique()):
-            agency_df = combined_tu.filter(pl.col('agency') == agency)
-            
-            for date_str in sorted(agency_df['date_str'].unique()):
-                date_df = agency_df.filter(pl.col('date_str') == date_str)
-                out_path = save_to_parquet_partitioned(
-                    date_df, output_dir, agency, 'trip_updates', date_str
-                )
-                print(f"  [{agency}] Saved {date_df.height} trip_updates to {out_path.name}")
-                saved_files += 1
-        
-        print(f"Saved {saved_files} trip_updates parquet files")
-    
-    # Save vehicle_positions / vehicle_positionsを保存
-    if vehicle_positions_dfs:
-        print(f"\nCombining {len(vehicle_positions_dfs)} vehicle_positions DataFrames...")
-        combined_vp = pl.concat(vehicle_positions_dfs, how="vertical")
-        print(f"Total vehicle_positions records: {combined_vp.height}")
-        
-        saved_files = 0
-        for agency in sorted(combined_vp['agency'].unique()):
-            agency_df = combined_vp.filter(pl.col('agency') == agency)
-            
-            for date_str in sorted(agency_df['date_str'].unique()):
-                date_df = agency_df.filter(pl.col('date_str') == date_str)
-                out_path = save_to_parquet_partitioned(
-                    date_df, output_dir, agency, 'vehicle_positions', date_str
-                )
-                print(f"  [{agency}] Saved {date_df.height} vehicle_positions to {out_path.name}")
-                saved_files += 1
-        
-        print(f"Saved {saved_files} vehicle_positions parquet files")
+    tu_files = sum(1 for key in writers if key[2] == 'trip_updates')
+    vp_files = sum(1 for key in writers if key[2] == 'vehicle_positions')
+    print(f"Saved {tu_files} trip_updates parquet files")
+    print(f"Saved {vp_files} vehicle_positions parquet files")
+
+
+def _process_one_tar_file(args: Tuple[str, str, Optional[str], Optional[int], bool]) -> Tuple[str, Optional[str]]:
+    """
+    Process one archive of a directory batch (process-pool worker)
+    ディレクトリ一括処理の1アーカイブ分をワーカープロセスで処理する
+
+    Returns:
+        Tuple of (tar path, formatted traceback or None on success)
+    """
+    tar_file, output_dir, agency_filter, threads, use_python = args
+    try:
+        if HAS_DUCKDB and not use_python:
+            process_tar_with_duckdb(
+                Path(tar_file),
+                Path(output_dir),
+                agency_filter=agency_filter,
+                show_agencies=False,
+                threads=threads,
+            )
+        else:
+            process_tar_to_normalized_parquet(
+                Path(tar_file),
+                Path(output_dir),
+                agency_filter=agency_filter,
+                show_agencies=False,
+                workers=threads,
+            )
+        return tar_file, None
+    except Exception:
+        import traceback
+        return tar_file, traceback.format_exc()
 
 
 def process_tar_directory(tar_dir: str, output_dir: str, pattern: str = "*.tar*", agency_filter: str = None, threads: int = None, use_python: bool = False):
@@ -608,34 +1208,44 @@ def process_tar_directory(tar_dir: str, output_dir: str, pattern: str = "*.tar*"
     
     print(f"Processing {len(tar_files)} tar file(s)...")
     
-    for tar_file in tar_files:
-        print(f"\n{'='*60}")
-        print(f"Processing tar file: {tar_file.name}")
-        print(f"{'='*60}")
+    if len(tar_files) == 1:
+        # Single archive: run in-process so its own pool gets every core
+        # 1本だけなら在来どおりプロセス内で実行し、内側のプールに全コアを渡す
+        tar_file, err = _process_one_tar_file(
+            (str(tar_files[0]), str(output_dir_path), agency_filter, threads, use_python)
+        )
+        if err:
+            print(f"Error: Failed to process {Path(tar_file).name}:\n{err}")
+        return
+    
+    # Archives are independent and CPU-bound inside, so fan out across a
+    # process pool; longest-job-first keeps mixed-size batches balanced.
+    # Each archive worker gets a slice of the cores for its inner pool so
+    # the two levels together do not oversubscribe the machine.
+    # アーカイブ間は独立なのでプロセスプールで並列化する（大きい順に投入し、
+    # 内側プールへはコアを分配して二重の過剰並列を防ぐ）
+    tar_files = sorted(tar_files, key=lambda t: -t.stat().st_size)
+    total_workers = threads or detect_workers()
+    n_workers = min(len(tar_files), max(1, total_workers // 2))
+    inner_threads = max(1, total_workers // n_workers)
+    
+    tasks = [
+        (str(tar_file), str(output_dir_path), agency_filter, inner_threads, use_python)
+        for tar_file in tar_files
+    ]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {executor.submit(_process_one_tar_file, task): task[0] for task in tasks}
         
-        try:
-            # Use DuckDB by default unless use_python is True
-            if HAS_DUCKDB and not use_python:
-                process_tar_with_duckdb(
-                    tar_file,
-                    output_dir_path,
-                    agency_filter=agency_filter,
-                    show_agencies=False,
-                    threads=threads
-                )
+        iterator = as_completed(futures)
+        if HAS_TQDM:
+            iterator = tqdm(iterator, total=len(futures), desc="Archives", unit="tar")
+        
+        for future in iterator:
+            tar_file, err = future.result()
+            if err:
+                print(f"Error: Failed to process {Path(tar_file).name}:\n{err}")
             else:
-                process_tar_to_normalized_parquet(
-                    tar_file,
-                    output_dir_path,
-                    agency_filter=agency_filter,
-                    show_agencies=False,
-                    workers=threads
-                )
-        except Exception as e:
-            print(f"Error: Failed to process {tar_file.name}: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
+                print(f"Finished {Path(tar_file).name}")
 
 
 def create_test_tar(test_dir: Path) -> Path:
@@ -644,16 +1254,20 @@ def create_test_tar(test_dir: Path) -> Path:
     テスト用のGTFS-RT形式JSONを含むtarファイルを作成
     
     Args:
-        test_dir: Directory to create test files in / テストファイルを作成するディレクトリ
+        test_dir: Kept for call compatibility; the fixture itself is cached
+            in the system temp dir / 互換のため残置（フィクスチャ本体は
+            システムの一時ディレクトリにキャッシュされる）
         
     Returns:
-        Path to the created tar file / 作成されたtarファイルのパス
+        Path to the (possibly cached) tar file / （キャッシュ済みの場合もある）tarファイルのパス
     """
-    import json
-    from datetime import datetime, timedelta
+    from datetime import timedelta
     
-    # Create mock GTFS-RT JSON data / モックGTFS-RT JSONデータを作成
-    now = datetime.now()
+    # Create mock GTFS-RT JSON data. A fixed clock keeps the payloads
+    # byte-identical across runs so the fixture cache below can hit.
+    # モックGTFS-RT JSONデータを作成（固定時刻で内容を毎回同一にし、
+    # 下のフィクスチャキャッシュを効かせる）
+    now = datetime(2025, 11, 10, 12, 0, 0)
     now_timestamp = int(now.timestamp())
     ts_str = now.strftime("%Y%m%d_%H%M%S")
     ts_str_plus1h = (now + timedelta(hours=1)).strftime("%Y%m%d_%H%M%S")
@@ -709,16 +1323,30 @@ def create_test_tar(test_dir: Path) -> Path:
     # Create test files with expected filename pattern for parser
     # 期待されるファイル名パターンでテストファイルを作成
     # Pattern: gtfs_rt_{feed_type}_{agency}_{YYYYMMDD_HHMMSS}.json
+    # Serialize each payload once and reuse the bytes / 各ペイロードは一度だけ直列化
+    trip_update_bytes = json.dumps(trip_update_json).encode('utf-8')
+    vehicle_position_bytes = json.dumps(vehicle_position_json).encode('utf-8')
     test_files = {
-        f'test_agency/gtfs_rt_trip_updates_test_agency_{ts_str}.json': json.dumps(trip_update_json).encode('utf-8'),
-        f'test_agency/gtfs_rt_vehicle_positions_test_agency_{ts_str}.json': json.dumps(vehicle_position_json).encode('utf-8'),
-        f'test_agency/gtfs_rt_trip_updates_test_agency_{ts_str_plus1h}.json': json.dumps(trip_update_json).encode('utf-8'),
+        f'test_agency/gtfs_rt_trip_updates_test_agency_{ts_str}.json': trip_update_bytes,
+        f'test_agency/gtfs_rt_vehicle_positions_test_agency_{ts_str}.json': vehicle_position_bytes,
+        f'test_agency/gtfs_rt_trip_updates_test_agency_{ts_str_plus1h}.json': trip_update_bytes,
     }
     
-    # Create tar file / tarファイルを作成
-    tar_path = test_dir / 'test.tar.gz'
-    
-    with tarfile.open(tar_path, 'w:gz') as tar:
+    # Cache the tarball keyed by a hash of its contents so repeated test
+    # runs skip the tar+gzip work entirely; a changed spec gets a new key.
+    # 内容ハッシュをキーにtarをキャッシュし、再実行時は生成を丸ごと省略する
+    spec = hashlib.sha256()
+    for filename in sorted(test_files):
+        spec.update(filename.encode('utf-8'))
+        spec.update(test_files[filename])
+    cache_path = Path(tempfile.gettempdir()) / f'tar2parquet_fixture_{spec.hexdigest()[:16]}.tar.gz'
+    if cache_path.exists():
+        return cache_path
+    
+    # Create tar file (write-then-rename so concurrent runs never see a
+    # half-written fixture) / tarファイルを作成（書き込み後にrename）
+    tmp_path = cache_path.with_suffix('.tmp')
+    with tarfile.open(tmp_path, 'w:gz') as tar:
         for filename, content in test_files.items():
             # Create TarInfo object / TarInfoオブジェクトを作成
             tarinfo = tarfile.TarInfo(name=filename)
@@ -726,8 +1354,9 @@ def create_test_tar(test_dir: Path) -> Path:
             
             # Add file to tar / tarにファイルを追加
             tar.addfile(tarinfo, io.BytesIO(content))
+    os.replace(tmp_path, cache_path)
     
-    return tar_path
+    return cache_path
 
 
 def run_test():
@@ -764,20 +1393,21 @@ def run_test():
             print("   Using Python processing...")
             process_tar_to_normalized_parquet(tar_path, output_dir)
         
-        # Verify output / 出力を検証
+        # Verify output (extension follows --output-format) / 出力を検証
         print("\n3. Verifying output...")
-        parquet_files = list(output_dir.glob('**/*.parquet'))
+        ext = 'arrow' if _OUTPUT_FORMAT == 'arrow_ipc' else 'parquet'
+        parquet_files = list(output_dir.glob(f'**/*.{ext}'))
         
         if not parquet_files:
-            print("   ❌ FAILED: No parquet files created")
+            print(f"   ❌ FAILED: No {ext} files created")
             return False
         
-        print(f"   ✓ Found {len(parquet_files)} parquet file(s)")
+        print(f"   ✓ Found {len(parquet_files)} {ext} file(s)")
         
-        # Read and verify parquet content / parquetの内容を読み込んで検証
+        # Read and verify output content / 出力の内容を読み込んで検証
         for pq_file in parquet_files:
-            print(f"\n4. Reading parquet file: {pq_file.name}")
-            df = pl.read_parquet(pq_file)
+            print(f"\n4. Reading {ext} file: {pq_file.name}")
+            df = pl.read_ipc(pq_file) if ext == 'arrow' else pl.read_parquet(pq_file)
             
             print(f"   ✓ Number of records: {df.height}")
             print(f"   ✓ Columns: {df.columns}")
@@ -884,6 +1514,43 @@ Examples:
         help='Force Python processing instead of DuckDB (slower but no extra dependencies)'
     )
     
+    parser.add_argument(
+        '--parquet-compression',
+        type=str,
+        choices=['zstd', 'snappy', 'none'],
+        default='zstd',
+        help='Parquet compression codec for output files (default: zstd)'
+    )
+    
+    parser.add_argument(
+        '--parquet-level',
+        type=int,
+        default=3,
+        help='Compression level when using zstd (default: 3)'
+    )
+    
+    parser.add_argument(
+        '--duckdb-mem',
+        type=int,
+        default=8,
+        help='DuckDB memory limit in GB (default: 8)'
+    )
+    
+    parser.add_argument(
+        '--duckdb-tmp',
+        type=str,
+        default=None,
+        help='DuckDB spill directory (default: /dev/shm when available, else system temp dir)'
+    )
+    
+    parser.add_argument(
+        '--output-format',
+        type=str,
+        choices=['parquet', 'arrow_ipc'],
+        default='parquet',
+        help='Output file format; arrow_ipc writes Feather v2 for zero-copy downstream readers (default: parquet)'
+    )
+    
     parser.add_argument(
         '--test',
         action='store_true',
@@ -892,6 +1559,9 @@ Examples:
     
     args = parser.parse_args()
     
+    _set_parquet_options(args.parquet_compression, args.parquet_level, args.output_format)
+    _set_duckdb_options(args.duckdb_mem, args.duckdb_tmp)
+    
     # Run test if requested / テストモードが要求された場合は実行
     if args.test:
         success = run_test()
@@ -903,26 +1573,14 @@ Examples:
             print("Error: --show-agencies requires --tar-path")
             return 1
         
-        tar_path = Path(os.path.expandvars(os.path.expanduser(args.tar_path)))
+        tar_path = _resolve(args.tar_path)
         if not tar_path.exists():
             print(f"Error: Tar file not found: {tar_path}")
             return 1
         
-        # Use DuckDB by default for agency discovery / Agency検出にはデフォルトでDuckDBを使用
-        if HAS_DUCKDB and not args.use_python:
-            process_tar_with_duckdb(
-                tar_path,
-                Path('./tmp'),  # Dummy output dir
-                show_agencies=True,
-                threads=args.workers
-            )
-        else:
-            process_tar_to_normalized_parquet(
-                tar_path,
-                Path('./tmp'),  # Dummy output dir
-                show_agencies=True,
-                workers=1  # Sequential for discovery mode
-            )
+        # Header-only scan: discovery never parses a member body
+        # ヘッダー走査のみでagencyを検出（本体は展開・解析しない）
+        list_agencies(tar_path)
         return 0
     
     # Normal processing mode / 通常処理モード
@@ -932,8 +1590,8 @@ Examples:
             print("Error: --output-dir is required when using --tar-path")
             return 1
         
-        tar_path = Path(os.path.expandvars(os.path.expanduser(args.tar_path)))
-        output_dir = Path(os.path.expandvars(os.path.expanduser(args.output_dir)))
+        tar_path = _resolve(args.tar_path)
+        output_dir = _resolve(args.output_dir)
         
         if not tar_path.exists():
             print(f"Error: Tar file not found: {tar_path}")
@@ -969,8 +1627,8 @@ Examples:
             print("Error: --output-dir is required when using --tar-dir")
             return 1
         
-        tar_dir = os.path.expandvars(os.path.expanduser(args.tar_dir))
-        output_dir = os.path.expandvars(os.path.expanduser(args.output_dir))
+        tar_dir = _resolve(args.tar_dir)
+        output_dir = _resolve(args.output_dir)
         
         if not os.path.isdir(tar_dir):
             print(f"Error: Directory not found: {tar_dir}")